@@ -5,7 +5,7 @@
     'name': 'Account Multipayment General',
     'description': """
         Modulo Para Generar Pagos Multiples""",
-    'version': '16.0.1.0.0',
+    'version': '16.0.1.1.0',
     'license': 'AGPL-3',
     'author': 'Munin',
     'depends': [
@@ -13,8 +13,12 @@
     ],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron.xml',
         'wizards/multi_payments.xml',
         'views/multi_payment_views.xml',
+        'views/multi_payment_job_views.xml',
+        'views/multi_payment_run_views.xml',
+        'views/multi_payment_allocation_views.xml',
     ],
     'demo': [
     ],
@@ -0,0 +1,24 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo.tools.sql import column_exists, create_column
+
+
+def migrate(cr, version):
+    """ Create and backfill account_move.is_multipayment_record in SQL so the ORM does not recompute the stored
+    field over every journal entry on upgrade.
+    """
+    if not version or column_exists(cr, 'account_move', 'is_multipayment_record'):
+        return
+    create_column(cr, 'account_move', 'is_multipayment_record', 'boolean')
+    cr.execute("""
+        UPDATE account_move move
+           SET is_multipayment_record = TRUE
+          FROM (
+                SELECT DISTINCT move_id
+                  FROM account_move_line
+                 WHERE temp_id IS NOT NULL
+                   AND temp_id != 0
+               ) line
+         WHERE line.move_id = move.id
+    """)
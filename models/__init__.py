@@ -1 +1,5 @@
 from . import account_move
+from . import account_journal
+from . import multi_payment_job
+from . import multi_payment_run
+from . import multi_payment_allocation
@@ -0,0 +1,36 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, models, tools
+
+
+class AccountJournal(models.Model):
+    _inherit = "account.journal"
+
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_multipayment_default_journal_id(self, company_id):
+        """ Id of the bank journal proposed by the multipayment wizard, cached per company until a journal changes. """
+        return self.search([('type', '=', 'bank'), ('company_id', '=', company_id)], limit=1).id
+
+    @api.model
+    def _get_multipayment_default_journal(self, company=None):
+        company = company or self.env.company
+        return self.browse(self._get_multipayment_default_journal_id(company.id))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        journals = super().create(vals_list)
+        self.clear_caches()
+        return journals
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'type', 'company_id', 'active', 'sequence'} & set(vals):
+            self.clear_caches()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.clear_caches()
+        return res
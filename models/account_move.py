@@ -1,66 +1,88 @@
 # Copyright 2026 Munin
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
+import logging
+
 from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
 
 
 class AccountMove(models.Model):
     _inherit = "account.move"
 
-    is_multipayment_record = fields.Boolean(string="Is Multipayment?",
-                                            compute="_compute_is_multipayment")
-
-
-    def action_open_multipayment_wizard(self):
-        rec_vals = []
-        for invoice_id in self:
-            res = {}
-            lines = invoice_id.line_ids
-            available_lines = self.env['account.move.line']
-            for line in lines:
-                if line.move_id.state != 'posted':
-                    raise UserError(_("You can only register payment for posted journal entries."))
-
-                if line.account_type not in ('asset_receivable', 'liability_payable'):
+    is_multipayment_record = fields.Boolean(string="Is Multipayment?", compute="_compute_is_multipayment",
+                                            store=True, index=True)
+    multipayment_allocation_ids = fields.One2many('multi.payment.allocation', 'invoice_id',
+                                                  string="Multipayment Allocations")
+    multipayment_allocation_count = fields.Integer(compute='_compute_multipayment_allocation_count')
+    multipayment_edi_pending = fields.Boolean(string="Multipayment CFDI Pending", copy=False, index=True,
+                                              help="The CFDI documents of this multipayment are prepared by a "
+                                                   "scheduled action.")
+    multipayment_edi_error = fields.Text(string="Multipayment CFDI Error", copy=False, readonly=True,
+                                         help="Error raised while the scheduled action prepared the CFDI documents of "
+                                              "this multipayment.")
+
+
+    def _get_multipayment_lines_domain(self):
+        return [('move_id', 'in', self.ids),
+                ('account_type', 'in', ('asset_receivable', 'liability_payable')),
+                ('reconciled', '=', False)]
+
+    def _get_multipayment_open_lines(self):
+        """ Fetch the open receivable/payable lines of the whole selection with a single search.
+        :return: A dict mapping each move having something left to pay to its account.move.line records.
+        """
+        lines = self.env['account.move.line'].search(self._get_multipayment_lines_domain(), order='move_id, id')
+        lines_by_move = {}
+        for line in lines:
+            if line.currency_id:
+                if line.currency_id.is_zero(line.amount_residual_currency):
                     continue
-                if line.currency_id:
-                    if line.currency_id.is_zero(line.amount_residual_currency):
-                        continue
-                else:
-                    if line.company_currency_id.is_zero(line.amount_residual):
-                        continue
-                available_lines |= line
-
-            # Check.
-            if not available_lines:
-                raise UserError(_(
-                    "You can't register a payment because there is nothing left to pay on the selected journal items."))
-            if len(lines.company_id) > 1:
-                raise UserError(_("You can't create payments for entries belonging to different companies."))
-            if len(set(available_lines.mapped('account_type'))) > 1:
+            elif line.company_currency_id.is_zero(line.amount_residual):
+                continue
+            lines_by_move.setdefault(line.move_id, []).append(line.id)
+        return {move: self.env['account.move.line'].browse(line_ids) for move, line_ids in lines_by_move.items()}
+
+    def _get_multipayment_available_lines(self):
+        """ Fetch the open receivable/payable lines of the whole selection and validate them in one pass.
+        :return: A dict mapping each move of the selection to its available account.move.line records.
+        """
+        if any(move.state != 'posted' for move in self):
+            raise UserError(_("You can only register payment for posted journal entries."))
+        if len(self.company_id) > 1:
+            raise UserError(_("You can't create payments for entries belonging to different companies."))
+
+        lines_by_move = self._get_multipayment_open_lines()
+        if len(lines_by_move) != len(self):
+            raise UserError(_(
+                "You can't register a payment because there is nothing left to pay on the selected journal items."))
+        available_lines = {}
+        for move in self:
+            move_lines = lines_by_move[move]
+            if len(set(move_lines.mapped('account_type'))) > 1:
                 raise UserError(
                     _("You can't register payments for journal items being either all inbound, either all outbound."))
+            available_lines[move] = move_lines
+        return available_lines
+
+    def action_open_multipayment_wizard(self):
+        available_lines = self._get_multipayment_available_lines()
+        journal_id = self.env['account.journal']._get_multipayment_default_journal(self.env.user.company_id)
+        register_payments = self.env['account.payment.register'].create([{
+            'partner_id': lines[0].partner_id.id,
+            'line_ids': [(6, 0, lines.ids)],
+            'journal_id': journal_id.id,
+        } for lines in available_lines.values()])
+        register_payments._compute_communication()
 
-            res['line_ids'] = [(6, 0, available_lines.ids)]
-            values = {
-                'partner_id': available_lines[0].partner_id.id,
-                'line_ids': res['line_ids'],
-            }
-            register_payment_id = self.env['account.payment.register'].create(values)
-            register_payment_id._compute_communication()
-            rec_vals.append(register_payment_id)
-
-        journal_id = self.env['account.journal'].search([('type', '=', 'bank'),
-                                                         ('company_id', '=', self.env.user.company_id.id)],
-                                                        limit=1)
-        for rec in rec_vals:
-            rec.journal_id = journal_id.id
         res = self.env['multi.payments.general'].create({'journal_id': journal_id.id,
-                                                             'l10n_mx_edi_payment_method_id':
-                                                                 fields.first(self).l10n_mx_edi_payment_method_id.id,
-                                                             'l10n_mx_edi_usage': fields.first(self).l10n_mx_edi_usage,
-                                                             })
-        res.register_payment_line = [record.id for record in rec_vals]
+                                                         'l10n_mx_edi_payment_method_id':
+                                                             fields.first(self).l10n_mx_edi_payment_method_id.id,
+                                                         'l10n_mx_edi_usage': fields.first(self).l10n_mx_edi_usage,
+                                                         'register_payment_line': [(6, 0, register_payments.ids)],
+                                                         })
         return {
             'name': _('Register Payment Multi Invoice'),
             'res_model': 'multi.payments.general',
@@ -69,10 +91,58 @@ class AccountMove(models.Model):
             'res_id': res.id,
             'type': 'ir.actions.act_window', }
 
+    def _update_multipayment_edi_documents(self):
+        self._update_payments_edi_documents()
+        cfdi_format = self.env.ref('l10n_mx_edi.edi_cfdi_3_3')
+        self.edi_document_ids.filtered(lambda x: x.edi_format_id != cfdi_format).write({'state': False})
+        self.filtered('multipayment_edi_pending').write({'multipayment_edi_pending': False,
+                                                         'multipayment_edi_error': False})
+
+    @api.model
+    def _cron_update_multipayment_edi_documents(self, batch_size=200):
+        """ Prepare the CFDI documents of the multipayments created with defer_edi, batch_size moves at a time.
+        If the batch fails, its moves are retried one by one: a failing move is logged and leaves the queue with its
+        error in multipayment_edi_error, without rolling back the other moves.
+        """
+        moves = self.search([('multipayment_edi_pending', '=', True)], limit=batch_size + 1)
+        if len(moves) > batch_size:
+            self.env.ref('account_multipayment_general.ir_cron_update_multipayment_edi_documents')._trigger()
+        moves = moves[:batch_size]
+        try:
+            with self.env.cr.savepoint():
+                moves._update_multipayment_edi_documents()
+            return
+        except Exception:
+            _logger.info("Multipayment CFDI batch failed, retrying its %s moves one by one", len(moves))
+        for move in moves:
+            try:
+                with self.env.cr.savepoint():
+                    move._update_multipayment_edi_documents()
+            except Exception as error:
+                _logger.exception("Multipayment CFDI preparation failed for move %s", move.id)
+                move.write({'multipayment_edi_pending': False, 'multipayment_edi_error': str(error)})
+
+    def _compute_multipayment_allocation_count(self):
+        counts = self.env['multi.payment.allocation']._read_group(
+            [('invoice_id', 'in', self.ids)], ['invoice_id'], ['invoice_id'])
+        counts = {group['invoice_id'][0]: group['invoice_id_count'] for group in counts}
+        for record in self:
+            record.multipayment_allocation_count = counts.get(record.id, 0)
+
+    def action_open_multipayment_allocations(self):
+        self.ensure_one()
+        return {
+            'name': _('Multi Pagos'),
+            'res_model': 'multi.payment.allocation',
+            'view_mode': 'tree',
+            'domain': [('invoice_id', '=', self.id)],
+            'context': {'create': False},
+            'type': 'ir.actions.act_window', }
+
     @api.depends('line_ids.temp_id')
     def _compute_is_multipayment(self):
         for record in self:
-            record.is_multipayment_record = len([line for line in record.line_ids if line.temp_id]) > 0
+            record.is_multipayment_record = any(record.line_ids.mapped('temp_id'))
 
 class AccountMoveLine(models.Model):
     _inherit = "account.move.line"
@@ -83,6 +153,27 @@ class AccountMoveLine(models.Model):
 class AccountPayment(models.Model):
     _inherit = "account.payment"
 
+    multipayment_allocation_ids = fields.One2many('multi.payment.allocation', 'payment_id',
+                                                  string="Multipayment Allocations")
+    multipayment_allocation_count = fields.Integer(compute='_compute_multipayment_allocation_count')
+
+    def _compute_multipayment_allocation_count(self):
+        counts = self.env['multi.payment.allocation']._read_group(
+            [('payment_id', 'in', self.ids)], ['payment_id'], ['payment_id'])
+        counts = {group['payment_id'][0]: group['payment_id_count'] for group in counts}
+        for record in self:
+            record.multipayment_allocation_count = counts.get(record.id, 0)
+
+    def action_open_multipayment_allocations(self):
+        self.ensure_one()
+        return {
+            'name': _('Facturas Pagadas'),
+            'res_model': 'multi.payment.allocation',
+            'view_mode': 'tree',
+            'domain': [('payment_id', '=', self.id)],
+            'context': {'create': False},
+            'type': 'ir.actions.act_window', }
+
     def _synchronize_from_moves(self, changed_fields):
         if self._context.get('skip_account_move_synchronization'):
             return
@@ -0,0 +1,47 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models
+
+
+class MultiPaymentAllocation(models.Model):
+    _name = "multi.payment.allocation"
+    _description = "Asignacion de Multi Pago"
+    _order = "payment_id, id"
+    _rec_name = "invoice_id"
+
+    payment_id = fields.Many2one('account.payment', string="Pago", required=True, readonly=True, index=True,
+                                 ondelete='cascade')
+    payment_line_id = fields.Many2one('account.move.line', string="Apunte del Pago", readonly=True, index=True,
+                                      ondelete='cascade')
+    invoice_id = fields.Many2one('account.move', string="Factura", required=True, readonly=True, index=True,
+                                 ondelete='cascade')
+    partner_id = fields.Many2one('res.partner', string="Cliente", readonly=True)
+    company_id = fields.Many2one('res.company', string="Company", readonly=True, index=True)
+    currency_id = fields.Many2one('res.currency', string="Moneda", readonly=True)
+    amount = fields.Monetary(string="Monto", readonly=True)
+    date = fields.Date(related='payment_id.date', string="Fecha")
+    payment_state = fields.Selection(related='payment_id.state', string="Estado del Pago")
+
+    @api.model
+    def _get_amounts_by_invoice(self, payments):
+        """ Amounts of the given multi-payments allocated to each invoice.
+        :return: A dict invoice id -> {currency id -> amount}.
+        """
+        return self._get_grouped_amounts([('payment_id', 'in', payments.ids)], 'invoice_id')
+
+    @api.model
+    def _get_amounts_by_payment(self, invoices):
+        """ Amounts of the multi-payments allocated to each of the given invoices.
+        :return: A dict payment id -> {currency id -> amount}.
+        """
+        return self._get_grouped_amounts([('invoice_id', 'in', invoices.ids)], 'payment_id')
+
+    @api.model
+    def _get_grouped_amounts(self, domain, groupby):
+        res = {}
+        for group in self._read_group(domain, [groupby, 'currency_id', 'amount:sum'], [groupby, 'currency_id'],
+                                      lazy=False):
+            record_amounts = res.setdefault(group[groupby][0], {})
+            record_amounts[group['currency_id'] and group['currency_id'][0]] = group['amount']
+        return res
@@ -0,0 +1,231 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import logging
+import time
+
+from odoo import _, api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class MultiPaymentJob(models.Model):
+    _name = "multi.payment.job"
+    _description = "Multi Pago en Segundo Plano"
+    _order = "id desc"
+
+    name = fields.Char(string="Nombre", required=True, readonly=True)
+    state = fields.Selection([('pending', 'Pendiente'), ('running', 'En Proceso'), ('done', 'Terminado'),
+                              ('failed', 'Terminado con Errores')], string="Estado", default='pending',
+                             required=True, readonly=True, index=True)
+    company_id = fields.Many2one('res.company', string="Company", required=True, readonly=True)
+    user_id = fields.Many2one('res.users', string="Usuario", required=True, readonly=True,
+                              default=lambda self: self.env.user,
+                              help="The payments are created as this user, not as the user running the scheduled "
+                                   "action.")
+    journal_id = fields.Many2one('account.journal', string="Diario", required=True, readonly=True)
+    currency_id = fields.Many2one('res.currency', string="Moneda", readonly=True)
+    payment_date = fields.Date(string="Payment Date", required=True, readonly=True)
+    memo = fields.Char(string="Memo", readonly=True)
+    group_payment = fields.Boolean(string="Agrupar Pagos por Cliente", readonly=True)
+    defer_edi = fields.Boolean(string="Generar CFDI en Segundo Plano", readonly=True)
+    l10n_mx_edi_payment_method_id = fields.Many2one('l10n_mx_edi.payment.method', string="Metodo de Pago",
+                                                    readonly=True)
+    l10n_mx_edi_usage = fields.Char(string="Usage", readonly=True)
+    shard_count = fields.Integer(string="Particiones", default=1, readonly=True)
+    create_values = fields.Json(string="Create Values", readonly=True,
+                                help="Values returned by _pre_create_action, passed to every _create_payments call.")
+    chunk_ids = fields.One2many('multi.payment.job.chunk', 'job_id', string="Bloques", readonly=True)
+    payment_ids = fields.Many2many('account.payment', string="Pagos", compute='_compute_progress')
+    chunk_count = fields.Integer(string="Bloques", compute='_compute_progress')
+    done_count = fields.Integer(string="Bloques Procesados", compute='_compute_progress')
+    progress = fields.Float(string="Progreso", compute='_compute_progress')
+
+    @api.depends('chunk_ids.state', 'chunk_ids.payment_id')
+    def _compute_progress(self):
+        for job in self:
+            job.payment_ids = job.chunk_ids.payment_id
+            job.chunk_count = len(job.chunk_ids)
+            job.done_count = len(job.chunk_ids.filtered(lambda c: c.state != 'pending'))
+            job.progress = job.chunk_count and 100.0 * job.done_count / job.chunk_count
+
+    def action_open_job(self):
+        self.ensure_one()
+        return {
+            'name': _('Multi Pago en Segundo Plano'),
+            'res_model': 'multi.payment.job',
+            'view_mode': 'form',
+            'res_id': self.id,
+            'type': 'ir.actions.act_window', }
+
+    def action_open_payments(self):
+        self.ensure_one()
+        return {'name': _('Pagos'), 'type': 'ir.actions.act_window', 'res_model': 'account.payment',
+                'context': {'create': False}, 'view_mode': 'tree,form',
+                'domain': [('id', 'in', self.payment_ids.ids)], }
+
+    def action_retry_failed(self):
+        self.chunk_ids.filtered(lambda c: c.state == 'failed').write({'state': 'pending', 'error_message': False})
+        self.filtered(lambda j: j.state == 'failed').write({'state': 'running'})
+        self._trigger_process_crons()
+
+    @api.model
+    def _get_process_cron(self, shard=None):
+        """ Return the scheduled action processing the chunks of the given shard, or all chunks if shard is None.
+        A scheduled action never runs in parallel with itself, so every shard gets its own, created from the main one
+        the first time the shard is used. Deactivating it leaves its chunks to the main scheduled action.
+        """
+        main_cron = self.env.ref('account_multipayment_general.ir_cron_process_multi_payment_jobs').sudo()
+        if shard is None:
+            return main_cron
+        code = 'model._cron_process_jobs(shard=%d)' % shard
+        crons = self.env['ir.cron'].sudo().with_context(active_test=False)
+        cron = crons.search([('model_id', '=', main_cron.model_id.id), ('code', '=', code)], limit=1)
+        if not cron:
+            cron = crons.create({'name': '%s (%s %d)' % (main_cron.name, _('Particion'), shard),
+                                 'model_id': main_cron.model_id.id,
+                                 'state': 'code',
+                                 'code': code,
+                                 'user_id': main_cron.user_id.id,
+                                 'interval_number': main_cron.interval_number,
+                                 'interval_type': main_cron.interval_type,
+                                 'numbercall': -1,
+                                 'doall': False, })
+        return cron
+
+    def _trigger_process_crons(self):
+        """ Wake up the scheduled actions processing the jobs, one per shard when the jobs are sharded. """
+        shards = {shard for job in self for shard in (range(job.shard_count) if job.shard_count > 1 else [None])}
+        for shard in shards:
+            self._get_process_cron(shard)._trigger()
+
+    def _prepare_wizard_vals(self):
+        return {'company_id': self.company_id.id,
+                'journal_id': self.journal_id.id,
+                'currency_id': self.currency_id.id,
+                'payment_date': self.payment_date,
+                'memo': self.memo,
+                'group_payment': self.group_payment,
+                'defer_edi': self.defer_edi,
+                'l10n_mx_edi_payment_method_id': self.l10n_mx_edi_payment_method_id.id,
+                'l10n_mx_edi_usage': self.l10n_mx_edi_usage,
+                'run_in_background': True, }
+
+    def _get_wizard(self, wizard_values=None):
+        """ Rebuild a multi.payments.general wizard from the job, with the given account.payment.register values.
+        The wizard runs as the user who created the job, in the company of the job.
+        """
+        env = self.with_user(self.user_id).with_company(self.company_id).env
+        wizard = env['multi.payments.general'].create(self._prepare_wizard_vals())
+        if wizard_values:
+            env['account.payment.register'].create(
+                [dict(values, multi_payment_general_id=wizard.id) for values in wizard_values])
+        return wizard
+
+    def _process_chunks(self, limit=None, auto_commit=False, shard=None):
+        """ Create the pending payments of the job, one chunk (partner payment) at a time.
+        Chunks are locked while processed, so several workers can run the same job; chunks locked by another worker
+        are skipped.
+        :param limit:       Maximum number of chunks to process.
+        :param auto_commit: Commit after each chunk so progress survives a worker timeout.
+        :param shard:       Only process the chunks of this shard.
+        :return: The number of processed chunks.
+        """
+        self.ensure_one()
+        pending_chunks = self.chunk_ids.filtered(
+            lambda c: c.state == 'pending' and (shard is None or c.shard == shard)).sorted('sequence')
+        if self.state == 'pending' and self._try_lock():
+            self.state = 'running'
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+        processed = 0
+        for chunk in pending_chunks:
+            if limit is not None and processed >= limit:
+                break
+            if not chunk._try_lock():
+                continue
+            chunk._process()
+            processed += 1
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+        # Other workers may have processed chunks of this job since they were read.
+        self.chunk_ids.invalidate_recordset()
+        self.invalidate_recordset(['payment_ids', 'chunk_count', 'done_count', 'progress'])
+        if not self.chunk_ids.filtered(lambda c: c.state == 'pending') and self._try_lock():
+            self._finalize()
+            if auto_commit:
+                self.env.cr.commit()  # pylint: disable=invalid-commit
+        return processed
+
+    def _try_lock(self):
+        """ Lock the row of the record for the current transaction, without waiting.
+        :return: False if another transaction holds the lock or the record is not in a processable state anymore.
+        """
+        self.ensure_one()
+        self.flush_recordset(['state'])
+        self.env.cr.execute("SELECT id FROM %s WHERE id = %%s AND state IN ('pending', 'running') "
+                            "FOR UPDATE SKIP LOCKED" % self._table, [self.id])
+        return bool(self.env.cr.fetchone())
+
+    def _finalize(self):
+        self.ensure_one()
+        self._get_wizard()._post_create_action(self.chunk_ids.payment_id)
+        self.state = 'failed' if 'failed' in self.chunk_ids.mapped('state') else 'done'
+
+    @api.model
+    def _cron_process_jobs(self, chunk_limit=50, shard=None):
+        """ Process the pending jobs, re-triggering the scheduled action while chunks remain.
+        :param shard: Only process the chunks of this shard, see _get_process_cron.
+        """
+        remaining = chunk_limit
+        for job in self.search([('state', 'in', ('pending', 'running'))], order='id'):
+            remaining -= job._process_chunks(limit=remaining, auto_commit=True, shard=shard)
+            if remaining <= 0:
+                break
+        domain = [('state', '=', 'pending')]
+        if shard is not None:
+            domain.append(('shard', '=', shard))
+        if self.env['multi.payment.job.chunk'].search_count(domain):
+            self._get_process_cron(shard)._trigger()
+
+
+class MultiPaymentJobChunk(models.Model):
+    _name = "multi.payment.job.chunk"
+    _description = "Bloque de Multi Pago en Segundo Plano"
+    _order = "job_id, sequence, id"
+
+    job_id = fields.Many2one('multi.payment.job', string="Job", required=True, ondelete='cascade', index=True)
+    sequence = fields.Integer(string="Secuencia")
+    shard = fields.Integer(string="Particion", readonly=True, index=True)
+    state = fields.Selection([('pending', 'Pendiente'), ('done', 'Procesado'), ('failed', 'Error')],
+                             string="Estado", default='pending', required=True, index=True)
+    partner_id = fields.Many2one('res.partner', string="Cliente", readonly=True)
+    currency_id = fields.Many2one(related='job_id.currency_id')
+    amount = fields.Monetary(string="Monto", readonly=True)
+    wizard_values = fields.Json(string="Wizard Values", readonly=True)
+    payment_id = fields.Many2one('account.payment', string="Pago", readonly=True)
+    error_message = fields.Text(string="Error", readonly=True)
+
+    def _try_lock(self):
+        self.ensure_one()
+        self.env.cr.execute("SELECT id FROM %s WHERE id = %%s AND state = 'pending' FOR UPDATE SKIP LOCKED"
+                            % self._table, [self.id])
+        return bool(self.env.cr.fetchone())
+
+    def _process(self):
+        self.ensure_one()
+        job = self.job_id.with_context(multipayment_metrics=[])
+        start = time.perf_counter()
+        try:
+            with self.env.cr.savepoint():
+                wizard = job._get_wizard(self.wizard_values)
+                with wizard._track_phase('_create_payments', partner_id=self.partner_id.id) as phase:
+                    payment = wizard._create_payments([(self.partner_id, self.amount, wizard.register_payment_line)],
+                                                      **(job.create_values or {}))
+                    phase['records'] = len(payment)
+        except Exception as error:
+            _logger.exception("Multi payment job %s: chunk %s failed", job.id, self.id)
+            self.write({'state': 'failed', 'error_message': str(error)})
+        else:
+            self.write({'state': 'done', 'payment_id': payment.id})
+            wizard._log_run_metrics(time.perf_counter() - start, payment, job=job, partner=self.partner_id)
@@ -0,0 +1,33 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models
+
+
+class MultiPaymentRun(models.Model):
+    _name = "multi.payment.run"
+    _description = "Historial de Ejecucion de Multi Pagos"
+    _order = "id desc"
+    _rec_name = "create_date"
+
+    company_id = fields.Many2one('res.company', string="Company", readonly=True)
+    user_id = fields.Many2one('res.users', string="Usuario", readonly=True)
+    job_id = fields.Many2one('multi.payment.job', string="Job", readonly=True, index=True, ondelete='set null')
+    partner_id = fields.Many2one('res.partner', string="Cliente", readonly=True)
+    payment_ids = fields.Many2many('account.payment', string="Pagos", readonly=True)
+    group_payment = fields.Boolean(string="Agrupar Pagos por Cliente", readonly=True)
+    run_in_background = fields.Boolean(string="Procesar en Segundo Plano", readonly=True)
+    line_count = fields.Integer(string="Lineas", readonly=True)
+    record_count = fields.Integer(string="Registros Creados", readonly=True)
+    duration = fields.Float(string="Duracion (s)", readonly=True, digits=(16, 4))
+    query_count = fields.Integer(string="Consultas SQL", readonly=True)
+    metrics = fields.Json(string="Metricas por Fase", readonly=True)
+    metrics_text = fields.Text(string="Detalle", compute='_compute_metrics_text')
+
+    @api.depends('metrics')
+    def _compute_metrics_text(self):
+        for run in self:
+            run.metrics_text = '\n'.join(
+                '%(phase)s: %(time)ss, %(queries)s queries, %(records)s records' % entry
+                + (' (partner %s)' % entry['partner_id'] if entry.get('partner_id') else '')
+                for entry in run.metrics or [])
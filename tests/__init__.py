@@ -0,0 +1,4 @@
+from . import test_multipayment_benchmark
+from . import test_multi_payment_job
+from . import test_multi_payments
+from . import test_multi_payments_import
@@ -0,0 +1,48 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import fields
+from odoo.tests.common import new_test_user
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+class TestMultiPaymentsCommon(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.bank_journal = cls.company_data['default_journal_bank']
+        cls.bank_journal.currency_id = cls.company_data['currency']
+        cls.accountant = new_test_user(cls.env, login='multipayment_accountant',
+                                       groups='base.group_user,account.group_account_invoice',
+                                       company_id=cls.company_data['company'].id,
+                                       company_ids=[(6, 0, cls.company_data['company'].ids)])
+
+    def _create_invoice(self, partner, price_unit, currency=None):
+        invoice = self.env['account.move'].create({
+            'move_type': 'out_invoice',
+            'partner_id': partner.id,
+            'currency_id': (currency or self.company_data['currency']).id,
+            'invoice_date': fields.Date.today(),
+            'invoice_line_ids': [(0, 0, {
+                'product_id': self.product_a.id,
+                'quantity': 1,
+                'price_unit': price_unit,
+                'tax_ids': [(6, 0, [])],
+            })],
+        })
+        invoice.action_post()
+        return invoice
+
+    def _open_wizard(self, invoices, user=None):
+        invoices = invoices.with_user(user) if user else invoices
+        action = invoices.action_open_multipayment_wizard()
+        wizard = self.env['multi.payments.general'].with_env(invoices.env).browse(action['res_id'])
+        wizard.journal_id = self.bank_journal
+        wizard.onchange_journal_id()
+        return wizard
+
+    def _create_payments(self, wizard):
+        action = wizard.create_multi_payment()
+        return wizard.env['account.payment'].search(action.get('domain') or [('id', '=', action['res_id'])])
@@ -0,0 +1,122 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import TestMultiPaymentsCommon
+
+
+@tagged('post_install', '-at_install')
+class TestMultiPaymentJob(TestMultiPaymentsCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.wizard_class = type(cls.env['multi.payments.general'])
+
+    def _create_job(self, shard_count=1):
+        self.invoices = self._create_invoice(self.partner_a, 100.0) \
+            + self._create_invoice(self.partner_a, 150.0) \
+            + self._create_invoice(self.partner_b, 200.0)
+        wizard = self._open_wizard(self.invoices, user=self.accountant)
+        wizard.group_payment = True
+        wizard.run_in_background = True
+        wizard.shard_count = shard_count
+        action = wizard.create_multi_payment()
+        # The scheduled action runs as the superuser.
+        return self.env['multi.payment.job'].sudo().browse(action['res_id'])
+
+    def _fail_partner(self, partner):
+        create_payments = self.wizard_class._create_payments
+
+        def _create_payments(wizard, payment_groups, **kwargs):
+            if payment_groups[0][0] == partner:
+                raise UserError("Blocked partner")
+            return create_payments(wizard, payment_groups, **kwargs)
+        return patch.object(self.wizard_class, '_create_payments', _create_payments)
+
+    def test_job_one_chunk_per_partner(self):
+        job = self._create_job()
+
+        self.assertEqual(job.state, 'pending')
+        self.assertEqual(job.user_id, self.accountant)
+        self.assertRecordValues(job.chunk_ids, [
+            {'partner_id': self.partner_a.id, 'amount': 250.0, 'state': 'pending', 'payment_id': False},
+            {'partner_id': self.partner_b.id, 'amount': 200.0, 'state': 'pending', 'payment_id': False},
+        ])
+        self.assertEqual(set(self.invoices.mapped('payment_state')), {'not_paid'})
+
+    def test_job_process_chunks(self):
+        job = self._create_job()
+        with patch.object(self.wizard_class, '_post_create_action', autospec=True,
+                          side_effect=lambda wizard, payments: payments) as post_create_action:
+            job._process_chunks()
+
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(job.chunk_ids.mapped('state'), ['done', 'done'])
+        payments = job.chunk_ids.payment_id
+        self.assertEqual(len(payments), 2)
+        self.assertEqual(payments.partner_id, self.partner_a + self.partner_b)
+        self.assertEqual(payments.create_uid, self.accountant)
+        self.assertEqual(sorted(payments.mapped('amount')), [200.0, 250.0])
+        self.assertTrue(all(state in ('paid', 'in_payment') for state in self.invoices.mapped('payment_state')))
+        for invoice in self.invoices:
+            self.assertEqual(invoice._get_reconciled_payments().partner_id, invoice.partner_id)
+        post_create_action.assert_called_once()
+        self.assertEqual(post_create_action.call_args.args[1], payments)
+
+    def test_job_failed_chunk_and_retry(self):
+        job = self._create_job()
+        chunk_a, chunk_b = job.chunk_ids
+        with self._fail_partner(self.partner_b):
+            job._process_chunks()
+
+        self.assertEqual(job.state, 'failed')
+        self.assertRecordValues(chunk_b, [{'state': 'failed', 'payment_id': False}])
+        self.assertIn("Blocked partner", chunk_b.error_message)
+        self.assertEqual(chunk_a.state, 'done')
+        self.assertEqual(self.invoices.filtered(lambda i: i.partner_id == self.partner_b).payment_state, 'not_paid')
+
+        job.action_retry_failed()
+        self.assertEqual(job.state, 'running')
+        self.assertRecordValues(chunk_b, [{'state': 'pending', 'error_message': False}])
+        with patch.object(self.wizard_class, '_post_create_action', autospec=True,
+                          side_effect=lambda wizard, payments: payments) as post_create_action:
+            job._process_chunks()
+
+        self.assertEqual(job.state, 'done')
+        self.assertEqual(chunk_b.state, 'done')
+        self.assertEqual(chunk_b.payment_id.partner_id, self.partner_b)
+        self.assertTrue(all(state in ('paid', 'in_payment') for state in self.invoices.mapped('payment_state')))
+        self.assertEqual(post_create_action.call_args.args[1], chunk_a.payment_id + chunk_b.payment_id)
+
+    def test_job_shards(self):
+        job = self._create_job(shard_count=2)
+        crons = job._get_process_cron(0) + job._get_process_cron(1)
+
+        self.assertEqual(crons.mapped('code'), ['model._cron_process_jobs(shard=0)',
+                                                'model._cron_process_jobs(shard=1)'])
+        self.assertEqual(job._get_process_cron(0), crons[0])
+        self.assertEqual(job.chunk_ids.mapped('shard'), [self.partner_a.id % 2, self.partner_b.id % 2])
+        shard = job.chunk_ids[0].shard
+        job._process_chunks(shard=shard)
+        self.assertEqual(job.chunk_ids.mapped('state'),
+                         ['done' if chunk.shard == shard else 'pending' for chunk in job.chunk_ids])
+
+    def test_job_run_history(self):
+        self.env['ir.config_parameter'].sudo().set_param('account_multipayment_general.store_run_history', True)
+        job = self._create_job()
+        enqueue_run = self.env['multi.payment.run'].search([('job_id', '=', job.id)])
+        self.assertRecordValues(enqueue_run, [{'run_in_background': True, 'record_count': 2, 'partner_id': False}])
+
+        job._process_chunks()
+        chunk_runs = self.env['multi.payment.run'].search([('job_id', '=', job.id)]) - enqueue_run
+        self.assertRecordValues(chunk_runs.sorted('id'), [
+            {'partner_id': chunk.partner_id.id, 'payment_ids': chunk.payment_id.ids, 'record_count': 1,
+             'user_id': self.accountant.id, 'run_in_background': True}
+            for chunk in job.chunk_ids
+        ])
+        self.assertTrue(all(run.metrics for run in chunk_runs))
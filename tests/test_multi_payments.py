@@ -0,0 +1,149 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from unittest.mock import patch
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from .common import TestMultiPaymentsCommon
+
+
+@tagged('post_install', '-at_install')
+class TestMultiPayments(TestMultiPaymentsCommon):
+
+    def test_create_multi_payment_as_accountant(self):
+        invoices = self._create_invoice(self.partner_a, 100.0) + self._create_invoice(self.partner_b, 200.0)
+        wizard = self._open_wizard(invoices, user=self.accountant)
+        wizard.group_payment = True
+        payments = self._create_payments(wizard)
+
+        self.assertEqual(len(payments), 2)
+        self.assertTrue(all(state in ('paid', 'in_payment') for state in invoices.mapped('payment_state')))
+        allocations = self.env['multi.payment.allocation'].search([('payment_id', 'in', payments.ids)])
+        self.assertRecordValues(allocations.sorted('amount'), [
+            {'invoice_id': invoices[0].id, 'partner_id': self.partner_a.id, 'amount': 100.0},
+            {'invoice_id': invoices[1].id, 'partner_id': self.partner_b.id, 'amount': 200.0},
+        ])
+
+    def test_invoices_reconciled_with_their_own_counterpart(self):
+        invoices = self._create_invoice(self.partner_a, 100.0) \
+            + self._create_invoice(self.partner_a, 150.0) \
+            + self._create_invoice(self.partner_b, 200.0)
+        wizard = self._open_wizard(invoices)
+        wizard.group_payment = True
+        wizard_line_by_invoice = {line.line_ids.move_id: line for line in wizard.register_payment_line}
+        payments = self._create_payments(wizard)
+
+        self.assertEqual(len(payments), 2)
+        for invoice in invoices:
+            receivable_line = invoice.line_ids.filtered(lambda l: l.account_type == 'asset_receivable')
+            counterpart_lines = receivable_line.matched_credit_ids.credit_move_id
+            self.assertEqual(counterpart_lines.mapped('temp_id'), [wizard_line_by_invoice[invoice].id])
+            self.assertEqual(counterpart_lines.partner_id, invoice.partner_id)
+            self.assertEqual(invoice._get_reconciled_payments(), counterpart_lines.payment_id)
+        full_reconciles = invoices.line_ids.full_reconcile_id
+        self.assertEqual(len(full_reconciles), 3)
+
+    def test_payment_preview_matches_allocations(self):
+        invoices = self._create_invoice(self.partner_a, 100.0) + self._create_invoice(self.partner_b, 200.0)
+        wizard = self._open_wizard(invoices)
+        wizard.group_payment = True
+        line_b = wizard.register_payment_line.filtered(lambda l: l.partner_id == self.partner_b)
+        line_b.amount = 150.0
+        self.env.flush_all()
+
+        counts = {model: self.env[model].search_count([])
+                  for model in ('account.payment', 'account.move', 'account.partial.reconcile',
+                                'multi.payment.allocation')}
+        preview = wizard.get_payment_preview()
+        self.env.flush_all()
+        self.assertEqual(counts, {model: self.env[model].search_count([]) for model in counts})
+
+        self.assertEqual(len(preview), 2)
+        preview_allocations = sorted((reconciliation['invoice_id'], reconciliation['amount'])
+                                     for payment in preview for reconciliation in payment['reconciliations'])
+        self.assertEqual(preview_allocations, sorted([(invoices[0].id, 100.0), (invoices[1].id, 150.0)]))
+
+        payments = self._create_payments(wizard)
+        allocations = self.env['multi.payment.allocation'].search([('payment_id', 'in', payments.ids)])
+        self.assertEqual(sorted((allocation.invoice_id.id, allocation.amount) for allocation in allocations),
+                         preview_allocations)
+
+    def test_lock_lines_already_paid(self):
+        invoices = self._create_invoice(self.partner_a, 100.0) + self._create_invoice(self.partner_b, 200.0)
+        wizard = self._open_wizard(invoices)
+        other_wizard = self._open_wizard(invoices[1])
+        self._create_payments(other_wizard)
+
+        with self.assertRaisesRegex(UserError, 'already been paid') as error:
+            self._create_payments(wizard)
+        self.assertIn(invoices[1].display_name, str(error.exception))
+        self.assertNotIn(invoices[0].display_name, str(error.exception))
+
+    def test_lock_lines_locked_by_another_transaction(self):
+        invoices = self._create_invoice(self.partner_a, 100.0) + self._create_invoice(self.partner_b, 200.0)
+        wizard = self._open_wizard(invoices)
+        busy_line = invoices[0].line_ids.filtered(lambda l: l.account_type == 'asset_receivable')
+        try_lock_lines = type(wizard)._try_lock_lines
+
+        # The test transaction is never committed, so another cursor can neither see nor lock its lines: emulate the
+        # lock held by a concurrent run by leaving the line out of the locked ids.
+        def _try_lock_lines(model, lines):
+            return try_lock_lines(model, lines) - set(busy_line.ids)
+
+        with patch.object(type(wizard), '_try_lock_lines', _try_lock_lines), \
+                self.assertRaisesRegex(UserError, 'being paid in another operation') as error:
+            self._create_payments(wizard)
+        self.assertIn(invoices[0].display_name, str(error.exception))
+        self.assertNotIn(invoices[1].display_name, str(error.exception))
+        self.assertEqual(invoices.mapped('payment_state'), ['not_paid', 'not_paid'])
+
+    def test_edi_cron_isolates_failing_moves(self):
+        invoices = self._create_invoice(self.partner_a, 100.0) + self._create_invoice(self.partner_b, 200.0)
+        wizard = self._open_wizard(invoices)
+        wizard.group_payment = True
+        wizard.defer_edi = True
+        moves = self._create_payments(wizard).move_id.sorted('id')
+        self.assertEqual(moves.mapped('multipayment_edi_pending'), [True, True])
+        failing_move = moves[0]
+
+        def _update_payments_edi_documents(records):
+            if failing_move in records:
+                raise UserError("CFDI failure")
+        with patch.object(type(self.env['account.move']), '_update_payments_edi_documents',
+                          _update_payments_edi_documents):
+            self.env['account.move']._cron_update_multipayment_edi_documents()
+
+        self.assertRecordValues(moves, [
+            {'multipayment_edi_pending': False, 'multipayment_edi_error': "CFDI failure"},
+            {'multipayment_edi_pending': False, 'multipayment_edi_error': False},
+        ])
+
+    def test_total_to_full_reconcile_matches_standard(self):
+        company_currency = self.company_data['currency']
+        foreign_currency = self.currency_data['currency']
+        other_currency = self.setup_multi_currency_data(default_values={
+            'name': 'Dark Chocolate Coin',
+            'symbol': 'DCC',
+            'currency_unit_label': 'Dark Choco',
+            'currency_subunit_label': 'Dark Cacao Powder',
+        }, rate2016=6.0, rate2017=4.0)['currency']
+        branches = [
+            ('same currency', company_currency, company_currency),
+            ('foreign source paid in company currency', foreign_currency, company_currency),
+            ('company source paid in foreign currency', company_currency, foreign_currency),
+            ('two foreign currencies', foreign_currency, other_currency),
+        ]
+        for branch, invoice_currency, payment_currency in branches:
+            with self.subTest(branch=branch):
+                invoices = self._create_invoice(self.partner_a, 100.0, currency=invoice_currency) \
+                    + self._create_invoice(self.partner_b, 333.33, currency=invoice_currency)
+                wizard = self._open_wizard(invoices)
+                wizard.currency_id = payment_currency
+                for line in wizard.register_payment_line:
+                    self.assertEqual(line.currency_id, payment_currency)
+                    expected = line._get_total_amount_in_wizard_currency_to_full_reconcile(
+                        line._get_batches()[0], early_payment_discount=False)[0]
+                    self.assertAlmostEqual(line._get_multi_payment_total_to_full_reconcile({}), expected)
+                    self.assertAlmostEqual(line.total_a_pagar, expected)
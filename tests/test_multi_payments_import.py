@@ -0,0 +1,61 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import base64
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .common import TestMultiPaymentsCommon
+
+
+@tagged('post_install', '-at_install')
+class TestMultiPaymentsImport(TestMultiPaymentsCommon):
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.partner_a.vat = 'BE0477472701'
+        cls.today = fields.Date.to_string(fields.Date.today())
+
+    def _import(self, rows, **values):
+        content = '\n'.join(values.get('delimiter', ',').join(row) for row in [('ref', 'vat', 'amount', 'date')] + rows)
+        import_wizard = self.env['multi.payments.import'].create(dict({
+            'data_file': base64.b64encode(content.encode()),
+            'filename': 'remittance.csv',
+            'journal_id': self.bank_journal.id,
+        }, **values))
+        action = import_wizard.action_import()
+        return self.env['multi.payments.general'].browse(action['res_id'])
+
+    def test_import_rows(self):
+        invoice_a = self._create_invoice(self.partner_a, 100.0)
+        invoice_b = self._create_invoice(self.partner_b, 200.0)
+        invoice_c = self._create_invoice(self.partner_b, 300.0)
+        wizard = self._import([
+            (invoice_a.name, 'BE0477472701', '60.00', self.today),
+            ('INV/UNKNOWN', '', '10.00', self.today),
+            (invoice_a.name, 'BE0477472701', '40.00', self.today),
+            (invoice_b.name, 'BE0477472701', '200.00', self.today),
+            (invoice_c.name, '', '300', self.today),
+            (invoice_c.name + 'X', '', '1,5', self.today),
+        ])
+
+        self.assertRecordValues(wizard.register_payment_line.sorted('amount'), [
+            {'partner_id': self.partner_a.id, 'amount': 60.0, 'line_ids': invoice_a.line_ids.filtered(
+                lambda l: l.account_type == 'asset_receivable').ids},
+            {'partner_id': self.partner_b.id, 'amount': 300.0, 'line_ids': invoice_c.line_ids.filtered(
+                lambda l: l.account_type == 'asset_receivable').ids},
+        ])
+        errors = wizard.import_error_report.splitlines()
+        self.assertEqual(len(errors), 4)
+        self.assertIn('Line 3 (INV/UNKNOWN)', errors[0])
+        self.assertIn('Line 4 (%s)' % invoice_a.name, errors[1])
+        self.assertIn('Line 5 (%s)' % invoice_b.name, errors[2])
+        self.assertIn('Line 7 (%s)' % (invoice_c.name + 'X'), errors[3])
+
+    def test_import_decimal_comma(self):
+        invoice = self._create_invoice(self.partner_a, 2000.0)
+        wizard = self._import([(invoice.name, '', '1.234,56', self.today)], delimiter=';', decimal_separator=',')
+        self.assertRecordValues(wizard.register_payment_line, [{'amount': 1234.56}])
+        self.assertFalse(wizard.import_error_report)
@@ -0,0 +1,135 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+_logger = logging.getLogger(__name__)
+
+# (invoices, partners) per run, overridable with MULTIPAYMENT_BENCHMARK_SIZES="10:1,100:10".
+DEFAULT_SIZES = [(10, 1), (100, 10), (1000, 100), (5000, 300)]
+
+# Query ceilings per phase: (fixed queries, queries per invoice, queries per partner).
+QUERY_CEILINGS = {
+    'open_wizard': (300, 0, 0),
+    'compute_totals': (100, 2, 0),
+    'create_multi_payment_grouped': (400, 25, 60),
+    'create_multi_payment_ungrouped': (400, 25, 0),
+}
+
+
+def _get_sizes():
+    sizes = os.environ.get('MULTIPAYMENT_BENCHMARK_SIZES')
+    if not sizes:
+        return DEFAULT_SIZES
+    return [tuple(int(value) for value in size.split(':')) for size in sizes.split(',')]
+
+
+@tagged('post_install', '-at_install', '-standard', 'multipayment_benchmark')
+class TestMultipaymentBenchmark(AccountTestInvoicingCommon):
+    """ Wall time and SQL query count of the multipayment flow on synthetic data.
+    Run with --test-tags multipayment_benchmark; the report is logged and, when MULTIPAYMENT_BENCHMARK_REPORT is set,
+    written as JSON to that path so runs can be compared.
+    """
+
+    @classmethod
+    def setUpClass(cls, chart_template_ref=None):
+        super().setUpClass(chart_template_ref=chart_template_ref)
+        cls.report = []
+        # Pay in the company currency so the results do not depend on the rates available in the database.
+        cls.bank_journal = cls.company_data['default_journal_bank']
+        cls.bank_journal.currency_id = cls.company_data['currency']
+
+    @classmethod
+    def tearDownClass(cls):
+        report_path = os.environ.get('MULTIPAYMENT_BENCHMARK_REPORT')
+        if report_path:
+            with open(report_path, 'w') as report_file:
+                json.dump(cls.report, report_file, indent=2)
+        super().tearDownClass()
+
+    def _create_partners(self, count):
+        return self.env['res.partner'].create([{'name': 'Benchmark Partner %s' % index} for index in range(count)])
+
+    def _create_invoices(self, partners, count):
+        invoices = self.env['account.move'].create([{
+            'move_type': 'out_invoice',
+            'partner_id': partners[index % len(partners)].id,
+            'invoice_date': fields.Date.today(),
+            'invoice_line_ids': [(0, 0, {
+                'product_id': self.product_a.id,
+                'quantity': 1,
+                'price_unit': 100.0 + index % 50,
+                'tax_ids': [(6, 0, [])],
+            })],
+        } for index in range(count)])
+        invoices.action_post()
+        return invoices
+
+    @contextmanager
+    def _measure(self, phase, invoices, partners, group_payment=None):
+        self.env.flush_all()
+        self.env.invalidate_all()
+        query_count = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        yield
+        self.env.flush_all()
+        metrics = {
+            'phase': phase,
+            'invoices': invoices,
+            'partners': partners,
+            'group_payment': group_payment,
+            'queries': self.env.cr.sql_log_count - query_count,
+            'time': round(time.perf_counter() - start, 3),
+        }
+        self.report.append(metrics)
+        _logger.info("multipayment benchmark: %s", json.dumps(metrics))
+        fixed, per_invoice, per_partner = QUERY_CEILINGS[phase]
+        self.assertLessEqual(metrics['queries'], fixed + per_invoice * invoices + per_partner * partners,
+                             "Query ceiling exceeded for %s with %s invoices" % (phase, invoices))
+
+    def _run_flow(self, invoice_count, partner_count, group_payment):
+        partners = self._create_partners(partner_count)
+        invoices = self._create_invoices(partners, invoice_count)
+        phase_args = (invoice_count, partner_count)
+
+        with self._measure('open_wizard', *phase_args):
+            action = invoices.action_open_multipayment_wizard()
+        wizard = self.env['multi.payments.general'].browse(action['res_id'])
+        wizard.journal_id = self.bank_journal
+        wizard.onchange_journal_id()
+
+        # Changing the date recomputes total_a_pagar and the totals of every line, as in the form.
+        with self._measure('compute_totals', *phase_args):
+            wizard.payment_date = wizard.payment_date + timedelta(days=1)
+            wizard.onchange_payment_date()
+            wizard.register_payment_line.mapped('total_a_pagar')
+            wizard.amount_total
+
+        wizard.group_payment = group_payment
+        phase = 'create_multi_payment_grouped' if group_payment else 'create_multi_payment_ungrouped'
+        with self._measure(phase, *phase_args, group_payment=group_payment):
+            action = wizard.create_multi_payment()
+
+        payments = self.env['account.payment'].search(action.get('domain') or [('id', '=', action['res_id'])])
+        self.assertEqual(len(payments), partner_count if group_payment else 1)
+        self.assertTrue(all(invoices.mapped(lambda invoice: invoice.payment_state in ('paid', 'in_payment'))))
+
+    def test_benchmark_grouped(self):
+        for invoice_count, partner_count in _get_sizes():
+            with self.subTest(invoices=invoice_count, partners=partner_count):
+                self._run_flow(invoice_count, partner_count, group_payment=True)
+
+    def test_benchmark_ungrouped(self):
+        for invoice_count, partner_count in _get_sizes():
+            with self.subTest(invoices=invoice_count, partners=partner_count):
+                self._run_flow(invoice_count, partner_count, group_payment=False)
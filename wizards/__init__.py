@@ -1,2 +1,3 @@
 from . import multi_payments
 from . import account_payment_register
+from . import multi_payments_import
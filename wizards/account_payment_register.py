@@ -1,7 +1,8 @@
 # Copyright 2022 Munin
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from odoo import fields, models, api
+from odoo import _, fields, models, api
+from odoo.exceptions import UserError
 
 
 class AccountPaymentRegister(models.TransientModel):
@@ -26,22 +27,97 @@ class AccountPaymentRegister(models.TransientModel):
     @api.depends('source_amount', 'source_amount_currency', 'source_currency_id', 'company_id', 'currency_id',
                  'payment_date', 'multi_payment_general_id.currency_id')
     def _total_payment(self):
+        conversion_rates = {}
+        # Read the journal items of all the wizards at once instead of once per wizard in _get_batches().
+        self.filtered('multi_payment_general_id').line_ids._origin.mapped('amount_residual_currency')
         for wizard in self:
             if not wizard.multi_payment_general_id:
                 wizard.total_a_pagar = 0
                 continue
+            wizard.total_a_pagar = wizard._get_multi_payment_total_to_full_reconcile(conversion_rates)
 
-            batch_result = wizard._get_batches()[0]
-            total_amount_residual_in_wizard_currency = wizard\
-                ._get_total_amount_in_wizard_currency_to_full_reconcile(batch_result, early_payment_discount=False)[0]
+    def _get_multi_payment_total_to_full_reconcile(self, conversion_rates):
+        """ Same result as _get_total_amount_in_wizard_currency_to_full_reconcile() on the first batch without early
+        payment discount, computed from the prefetched journal items and shared conversion rates. The residuals are
+        read through the ORM prefetch rather than summed by a grouped SQL query: the branches below need them per
+        journal item, and the prefetched values are those _get_batches() would read anyway.
+        :param conversion_rates: A dict shared by the whole recordset, see _convert_with_rates.
+        :return: The residual amount of the first batch in the wizard currency.
+        """
+        self.ensure_one()
+        lines = self.line_ids._origin
+        if not lines or len(lines.company_id) > 1:
+            # Let _get_batches() raise the usual error.
+            batch_result = self._get_batches()[0]
+            return self._get_total_amount_in_wizard_currency_to_full_reconcile(
+                batch_result, early_payment_discount=False)[0]
 
-            wizard.total_a_pagar = total_amount_residual_in_wizard_currency
+        def serialize_batch_key(line):
+            return '-'.join(str(v) for v in self._get_line_batch_key(line).values())
 
-    def _prepare_payment_move_line_default_vals(self):
+        batch_key = serialize_batch_key(lines[0])
+        batch_lines = lines.filtered(lambda l: serialize_batch_key(l) == batch_key)
+        comp_curr = self.company_id.currency_id
+        if self.source_currency_id == self.currency_id:
+            return abs(sum(batch_lines.mapped('amount_residual_currency')))
+        elif self.source_currency_id != comp_curr and self.currency_id == comp_curr:
+            return self._convert_with_rates(self.source_amount_currency, self.source_currency_id, comp_curr,
+                                            self.company_id, self.payment_date, conversion_rates)
+        elif self.source_currency_id == comp_curr and self.currency_id != comp_curr:
+            residual_amount = 0.0
+            for aml in batch_lines:
+                if not aml.move_id.payment_id and not aml.move_id.statement_line_id:
+                    conversion_date = self.payment_date
+                else:
+                    conversion_date = aml.date
+                residual_amount += self._convert_with_rates(aml.amount_residual, comp_curr, self.currency_id,
+                                                            self.company_id, conversion_date, conversion_rates)
+            return abs(residual_amount)
+        return self._convert_with_rates(self.source_amount, comp_curr, self.currency_id, self.company_id,
+                                        self.payment_date, conversion_rates)
+
+    def _prepare_multi_payment_job_values(self):
+        """ Serialize the wizard lines so a multi.payment.job can rebuild them later on.
+        :return: A list of python dictionary to be passed to the account.payment.register's 'create' method.
+        """
+        return [{'partner_id': line.partner_id.id,
+                 'line_ids': [(6, 0, line.line_ids.ids)],
+                 'journal_id': line.journal_id.id,
+                 'payment_date': fields.Date.to_string(line.payment_date),
+                 'amount': line.amount,
+                 'payment_difference_handling': line.payment_difference_handling,
+                 'writeoff_account_id': line.writeoff_account_id.id,
+                 'writeoff_label': line.writeoff_label,
+                 'communication': line.communication, } for line in self]
+
+    @api.model
+    def _convert_with_rates(self, amount, from_currency, to_currency, company, date, conversion_rates):
+        ''' Same as res.currency._convert, resolving each rate only once per run.
+        :param conversion_rates: A dict (from currency, to currency, company, date) -> rate shared by the whole run.
+        :return: The amount in to_currency, rounded.
+        '''
+        if not amount:
+            return 0.0
+        key = (from_currency, to_currency, company, date)
+        if key not in conversion_rates:
+            conversion_rates[key] = self.env['res.currency']._get_conversion_rate(
+                from_currency, to_currency, company, date)
+        return to_currency.round(amount * conversion_rates[key])
+
+    def _convert_to_company_currency(self, amount, conversion_rates):
+        ''' Convert an amount expressed in the wizard currency to the company currency, see _convert_with_rates. '''
+        self.ensure_one()
+        return self._convert_with_rates(amount, self.currency_id, self.company_id.currency_id, self.company_id,
+                                        self.payment_date, conversion_rates)
+
+    def _prepare_payment_move_line_default_vals(self, conversion_rates=None):
         ''' Prepare the dictionary to create the default account.move.lines for the current payment.
+        :param conversion_rates: Optional rate cache to share between several calls, see _convert_to_company_currency.
         :return: A list of python dictionary to be passed to the account.move.line's 'create' method.
         '''
         res = []
+        if conversion_rates is None:
+            conversion_rates = {}
 
         for line in self:
             payment_vals = line._create_payment_vals_from_wizard(False)
@@ -70,18 +146,8 @@ class AccountPaymentRegister(models.TransientModel):
             else:
                 liquidity_amount_currency = write_off_amount_currency = 0.0
 
-            write_off_balance = line.currency_id._convert(
-                write_off_amount_currency,
-                line.company_id.currency_id,
-                line.company_id,
-                line.payment_date,
-            )
-            liquidity_balance = line.currency_id._convert(
-                liquidity_amount_currency,
-                line.company_id.currency_id,
-                line.company_id,
-                line.payment_date,
-            )
+            write_off_balance = line._convert_to_company_currency(write_off_amount_currency, conversion_rates)
+            liquidity_balance = line._convert_to_company_currency(liquidity_amount_currency, conversion_rates)
             counterpart_amount_currency = -liquidity_amount_currency - write_off_amount_currency
             counterpart_balance = -liquidity_balance - write_off_balance
             currency_id = line.currency_id.id
@@ -1,7 +1,17 @@
 # Copyright 2026 Munin
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from odoo import _, api, fields, models
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from markupsafe import Markup
+
+from odoo import _, api, fields, models, tools
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
 
 
 class MultiPaymentsGeneral(models.TransientModel):
@@ -15,14 +25,14 @@ class MultiPaymentsGeneral(models.TransientModel):
     available_partner_bank_ids = fields.Many2many(comodel_name='res.partner.bank', )
 
     journal_id = fields.Many2one('account.journal', string="Diario",
-                                 default=lambda self: self.env['account.journal'].search([('type', '=', 'bank')],
-                                                                                         limit=1))
+                                 default=lambda self: self.env['account.journal']._get_multipayment_default_journal())
 
     currency_id = fields.Many2one('res.currency', string="Moneda", compute='_compute_currency_id', store=True,
                                   readonly=False)
-    amount_total = fields.Monetary(string="Monto Total", compute='_compute_amount_total', store=False)
+    amount_total = fields.Monetary(string="Monto Total", compute='_compute_totals', store=False)
     amount_residual = fields.Monetary(string="Monto Restante", compute="_compute_totals")
-    payment_difference = fields.Monetary(compute='_compute_payment_difference')
+    payment_difference = fields.Monetary(compute='_compute_totals')
+    partner_summary = fields.Html(string="Resumen por Cliente", compute='_compute_partner_summary', sanitize=False)
     # == Payment difference fields ==
     payment_difference_handling = fields.Selection([('open', 'Keep open'), ('reconcile', 'Mark as fully paid'), ],
                                                    default='open', string="Payment Difference Handling")
@@ -37,9 +47,24 @@ class MultiPaymentsGeneral(models.TransientModel):
 
     group_payment = fields.Boolean(string="Agrupar Pagos por Cliente", compute="_compute_group_payment", store=True,
                                    readonly=False, help="Agrupar pagos por cliente, se un pago para cada cliente")
+    import_error_report = fields.Text(string="Errores de Importacion", readonly=True)
+    defer_edi = fields.Boolean(string="Generar CFDI en Segundo Plano",
+                               help="Preparar los documentos CFDI de los pagos mediante una accion planificada")
+    run_in_background = fields.Boolean(string="Procesar en Segundo Plano",
+                                       help="Crear los pagos en segundo plano, un cliente a la vez, mediante una "
+                                            "accion planificada")
+    shard_count = fields.Integer(string="Particiones", default=1,
+                                 help="Repartir los pagos en segundo plano en este numero de particiones por cliente, "
+                                      "procesadas en paralelo, cada una por su propia accion planificada.")
 
     def _get_usage_selection(self):
-        return self.env['account.move'].fields_get().get('l10n_mx_edi_usage').get('selection')
+        return self._get_cached_usage_selection(self.env.lang)
+
+    @api.model
+    @tools.ormcache('lang')
+    def _get_cached_usage_selection(self, lang):
+        field = self.env['account.move']._fields['l10n_mx_edi_usage']
+        return field._description_selection(self.with_context(lang=lang).env)
 
     l10n_mx_edi_usage = fields.Selection(_get_usage_selection, 'Usage', default='P01',
                                          help='This usage will be used instead of the default one for invoices.')
@@ -49,24 +74,79 @@ class MultiPaymentsGeneral(models.TransientModel):
         for record in self:
             record.group_payment = len(record.register_payment_line.partner_id) > 1
 
+    def _get_line_totals(self):
+        """ Sum the amounts of the wizard lines of the saved records with a single grouped query.
+        :return: A dict record id -> (amount_total, total_a_pagar, amount).
+        """
+        totals = {}
+        groups = self.env['account.payment.register']._read_group(
+            [('multi_payment_general_id', 'in', self.ids)],
+            ['multi_payment_general_id', 'payment_difference_handling', 'amount:sum', 'total_a_pagar:sum'],
+            ['multi_payment_general_id', 'payment_difference_handling'], lazy=False)
+        for group in groups:
+            amount_total, total_a_pagar, amount = totals.get(group['multi_payment_general_id'][0], (0.0, 0.0, 0.0))
+            amount_total += group['total_a_pagar'] if group['payment_difference_handling'] == 'reconcile' \
+                else group['amount']
+            totals[group['multi_payment_general_id'][0]] = (amount_total, total_a_pagar + group['total_a_pagar'],
+                                                            amount + group['amount'])
+        return totals
+
     @api.depends('register_payment_line', 'register_payment_line.total_a_pagar', 'register_payment_line.amount',
                  'register_payment_line.payment_difference_handling')
-    def _compute_amount_total(self):
+    def _compute_totals(self):
+        # Saved wizards are summed in SQL, so opening the form does not load every line; wizards being edited in the
+        # form only exist in cache and are summed in python.
+        totals = self.filtered('id')._get_line_totals()
         for record in self:
-            record.amount_total = sum(record.register_payment_line.mapped(
-                lambda x: x.amount if x.payment_difference_handling != 'reconcile' else x.total_a_pagar))
+            if record.id:
+                amount_total, total_a_pagar, amount = totals.get(record.id, (0.0, 0.0, 0.0))
+            else:
+                amount_total = total_a_pagar = amount = 0.0
+                for line in record.register_payment_line:
+                    amount_total += line.amount if line.payment_difference_handling != 'reconcile' \
+                        else line.total_a_pagar
+                    total_a_pagar += line.total_a_pagar
+                    amount += line.amount
+            record.amount_total = amount_total
+            record.payment_difference = abs(total_a_pagar - amount_total)
+            record.amount_residual = amount_total - amount
 
-    @api.depends('register_payment_line', 'register_payment_line.amount', 'amount_total',
+    @api.depends('register_payment_line.partner_id', 'register_payment_line.amount',
                  'register_payment_line.total_a_pagar')
-    def _compute_payment_difference(self):
-        for record in self:
-            record.payment_difference = abs(
-                sum(record.register_payment_line.mapped('total_a_pagar')) - record.amount_total)
-
-    @api.depends('register_payment_line', 'register_payment_line.amount', 'amount_total')
-    def _compute_totals(self):
+    def _compute_partner_summary(self):
+        # Same split as _compute_totals: saved wizards are grouped in SQL, wizards being edited in the form are grouped
+        # from the lines in cache.
+        groups = self.env['account.payment.register']._read_group(
+            [('multi_payment_general_id', 'in', self.filtered('id').ids)],
+            ['multi_payment_general_id', 'partner_id', 'amount:sum', 'total_a_pagar:sum'],
+            ['multi_payment_general_id', 'partner_id'], lazy=False, orderby='partner_id')
+        summary_by_record = {}
+        for group in groups:
+            summary_by_record.setdefault(group['multi_payment_general_id'][0], []).append(
+                (group['partner_id'] and group['partner_id'][1] or '', group['__count'], group['amount'],
+                 group['total_a_pagar']))
         for record in self:
-            record.amount_residual = record.amount_total - sum(record.register_payment_line.mapped('amount'))
+            if record.id:
+                summary = summary_by_record.get(record.id, [])
+            else:
+                summary_by_partner = {}
+                for line in record.register_payment_line:
+                    name, count, amount, total_a_pagar = summary_by_partner.get(
+                        line.partner_id, (line.partner_id.display_name or '', 0, 0.0, 0.0))
+                    summary_by_partner[line.partner_id] = (name, count + 1, amount + line.amount,
+                                                           total_a_pagar + line.total_a_pagar)
+                summary = sorted(summary_by_partner.values())
+            rows = Markup().join(
+                Markup('<tr><td>%s</td><td class="text-end">%s</td><td class="text-end">%s</td>'
+                       '<td class="text-end">%s</td></tr>') % (
+                    name, count,
+                    tools.format_amount(self.env, amount, record.currency_id),
+                    tools.format_amount(self.env, total_a_pagar, record.currency_id))
+                for name, count, amount, total_a_pagar in summary)
+            record.partner_summary = Markup(
+                '<table class="table table-sm"><thead><tr><th>%s</th><th class="text-end">%s</th>'
+                '<th class="text-end">%s</th><th class="text-end">%s</th></tr></thead><tbody>%s</tbody></table>') % (
+                _("Cliente"), _("Facturas"), _("Monto"), _("A Pagar"), rows)
 
     @api.depends('journal_id')
     def _compute_currency_id(self):
@@ -77,8 +157,10 @@ class MultiPaymentsGeneral(models.TransientModel):
 
     @api.onchange('journal_id')
     def onchange_journal_id(self):
-        for reg_pay_id in self.register_payment_line:
-            reg_pay_id.journal_id = self.journal_id.id
+        # Assign on the whole recordset so dependent computes are invalidated once for all the lines.
+        lines = self.register_payment_line.filtered(lambda l: l.journal_id != self.journal_id)
+        if lines:
+            lines.journal_id = self.journal_id
 
     @api.model
     def _compute_outstanding_account_id(self, pay, journal, payment_type, payment_method_line_id):
@@ -100,14 +182,29 @@ class MultiPaymentsGeneral(models.TransientModel):
 
     @api.onchange('payment_date')
     def onchange_payment_date(self):
-        for reg_pay_id in self.register_payment_line:
-            reg_pay_id.payment_date = self.payment_date
+        lines = self.register_payment_line.filtered(lambda l: l.payment_date != self.payment_date)
+        if lines:
+            lines.payment_date = self.payment_date
 
     def create_multi_payment(self):
-        self.check_payment_validity()
-        other_data = self._pre_create_action()
-        created_payments = self._create_payment_data(**other_data)
-        created_payments = self._post_create_action(created_payments)
+        self = self.with_context(multipayment_metrics=[])
+        start = time.perf_counter()
+        with self._track_phase('check_payment_validity'):
+            self.check_payment_validity()
+        with self._track_phase('_pre_create_action'):
+            other_data = self._pre_create_action()
+        if self.run_in_background:
+            with self._track_phase('_create_payment_job') as phase:
+                job = self._create_payment_job(**other_data)
+                phase['records'] = len(job.chunk_ids)
+            self._log_run_metrics(time.perf_counter() - start, job.chunk_ids, job=job)
+            return job.action_open_job()
+        with self._track_phase('_create_payment_data') as phase:
+            created_payments = self._create_payment_data(**other_data)
+            phase['records'] = len(created_payments)
+        with self._track_phase('_post_create_action'):
+            created_payments = self._post_create_action(created_payments)
+        self._log_run_metrics(time.perf_counter() - start, created_payments)
         action = {'name': _('Pagos'), 'type': 'ir.actions.act_window', 'res_model': 'account.payment',
                   'context': {'create': False}, }
         if len(created_payments) == 1:
@@ -116,34 +213,179 @@ class MultiPaymentsGeneral(models.TransientModel):
             action.update({'view_mode': 'tree,form', 'domain': [('id', 'in', created_payments.ids)], })
         return action
 
-    def _create_payment_data(self, **kwargs):
-        payment_ids = self.env['account.payment']
-        if self.group_payment:
-            payment_data = {}
-            for line in self.register_payment_line:
-                payment_data.setdefault(line.partner_id,
-                                        {'payment_amount': 0.0, 'wizard_lines': self.env['account.payment.register']})
-                payment_data[line.partner_id]['wizard_lines'] += line
-                payment_data[line.partner_id]['payment_amount'] += line.amount
-
-            for partner, values in payment_data.items():
-                amount_payment = values['payment_amount']
-                wizard_lines = values['wizard_lines']
-                account_payment = self.create_payment(partner=partner, amount_payment=amount_payment,
-                                                      wizard_lines=wizard_lines, **kwargs)
-                payment_ids += account_payment
-        else:
-            partners = [(partner, sum(self.register_payment_line.filtered(lambda p: p.partner_id == partner).mapped(
-                lambda x: x.amount if x.payment_difference_handling != 'reconcile' else x.total_a_pagar))) for partner in
-                        self.register_payment_line.partner_id]
-            partner_id, amount = max(partners, key=lambda x: x[1])
-            account_payment = self.create_payment(partner=partner_id, amount_payment=self.amount_total,
-                                                  wizard_lines=self.register_payment_line, **kwargs)
+    @contextmanager
+    def _track_phase(self, phase, **values):
+        """ Record the wall time and SQL query count of a phase of create_multi_payment.
+        Does nothing unless the 'multipayment_metrics' context key holds the list collecting the metrics.
+        :param phase:  The name of the phase.
+        :param values: Extra values to record, e.g. the partner of a payment.
+        :return: The dict recorded for the phase, the caller may set its 'records' key.
+        """
+        metrics = self._context.get('multipayment_metrics')
+        entry = dict(values, phase=phase, records=0)
+        if metrics is None:
+            yield entry
+            return
+        query_count = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry['time'] = round(time.perf_counter() - start, 4)
+            entry['queries'] = self.env.cr.sql_log_count - query_count
+            metrics.append(entry)
 
-            payment_ids += account_payment
-        return payment_ids
+    def _log_run_metrics(self, duration, records, job=None, partner=None):
+        """ Log the metrics collected by _track_phase, and store them as a multi.payment.run if enabled.
+        :param duration: The wall time of the whole run.
+        :param records:  The created records: the payments, or the chunks of the job when run_in_background.
+        :param job:      The multi.payment.job created, or processed by a chunk.
+        :param partner:  The partner of the processed chunk.
+        """
+        metrics = self._context.get('multipayment_metrics') or []
+        summary = {'wizard_id': self.id,
+                   'job_id': job.id if job else False,
+                   'partner_id': partner.id if partner else False,
+                   'payment_ids': records.ids if records._name == 'account.payment' else [],
+                   'group_payment': self.group_payment,
+                   'run_in_background': self.run_in_background,
+                   'lines': len(self.register_payment_line),
+                   'records': len(records),
+                   'time': round(duration, 4),
+                   'queries': sum(entry['queries'] for entry in metrics if '.' not in entry['phase']),
+                   'phases': metrics, }
+        _logger.info("multipayment run: %s", json.dumps(summary, default=str))
+        if self.env['ir.config_parameter'].sudo().get_param('account_multipayment_general.store_run_history'):
+            self.env['multi.payment.run'].sudo().create(self._prepare_run_history_vals(summary))
 
-    def create_payment(self, partner, amount_payment, wizard_lines, **kwargs):
+    def _prepare_run_history_vals(self, summary):
+        return {'company_id': self.company_id.id,
+                'user_id': self.env.uid,
+                'job_id': summary['job_id'],
+                'partner_id': summary['partner_id'],
+                'payment_ids': [(6, 0, summary['payment_ids'])],
+                'group_payment': summary['group_payment'],
+                'run_in_background': summary['run_in_background'],
+                'line_count': summary['lines'],
+                'record_count': summary['records'],
+                'duration': summary['time'],
+                'query_count': summary['queries'],
+                'metrics': summary['phases'], }
+
+    @api.model
+    def _get_partner_shard(self, partner, shard_count):
+        return partner.id % shard_count if shard_count > 1 else 0
+
+    def _get_payment_plan(self):
+        """ Build the payments to create as plain data, in a single pass over the wizard lines.
+        :return: A list of python dictionary, one per payment, with the keys partner_id, amount, currency_id,
+                 wizard_line_ids, invoice_line_ids and account_ids.
+        """
+        plan = {}
+        partner_amounts = {}
+        for line in self.register_payment_line:
+            payment = plan.setdefault(line.partner_id.id if self.group_payment else False, {
+                'partner_id': line.partner_id.id,
+                'amount': 0.0,
+                'currency_id': self.currency_id.id,
+                'wizard_line_ids': [],
+                'invoice_line_ids': [],
+                'account_ids': [],
+            })
+            payment['amount'] += line.amount
+            payment['wizard_line_ids'].append(line.id)
+            for invoice_line in line.line_ids._origin:
+                payment['invoice_line_ids'].append(invoice_line.id)
+                if invoice_line.account_id.id not in payment['account_ids']:
+                    payment['account_ids'].append(invoice_line.account_id.id)
+            partner_amounts.setdefault(line.partner_id.id, 0.0)
+            partner_amounts[line.partner_id.id] += \
+                line.amount if line.payment_difference_handling != 'reconcile' else line.total_a_pagar
+        if not self.group_payment and plan:
+            # A single payment, for the partner having the highest amount.
+            plan[False].update({'partner_id': max(partner_amounts.items(), key=lambda x: x[1])[0],
+                                'amount': self.amount_total})
+        return list(plan.values())
+
+    def _get_payment_groups(self, shard=None, shard_count=1):
+        """ Split the wizard lines into the payments to create, see _get_payment_plan.
+        :param shard:       Only keep the payments of this shard, see _get_partner_shard.
+        :param shard_count: The number of shards the payments are partitioned into.
+        :return: A list of (partner, amount_payment, wizard_lines) tuples, one per payment.
+        """
+        groups = []
+        for payment in self._get_payment_plan():
+            partner = self.env['res.partner'].browse(payment['partner_id'])
+            if shard is not None and self._get_partner_shard(partner, shard_count) != shard:
+                continue
+            groups.append((partner, payment['amount'],
+                           self.env['account.payment.register'].browse(payment['wizard_line_ids'])))
+        return groups
+
+    def get_payment_preview(self, **kwargs):
+        """ Dry run of create_multi_payment: compute the payments and reconciliations it would create without
+        writing anything.
+        :return: The payment plan, see _get_payment_plan, where every payment also holds the 'payment_vals' passed to
+                 account.payment's 'create' method and its 'reconciliations': the amount each invoice receives, split
+                 the same way as the multi.payment.allocation records, see _split_allocation_amount.
+        """
+        self.ensure_one()
+        plan = self._get_payment_plan()
+        conversion_rates = {}
+        for payment in plan:
+            partner = self.env['res.partner'].browse(payment['partner_id'])
+            wizard_lines = self.env['account.payment.register'].browse(payment['wizard_line_ids'])
+            payment['payment_vals'] = self._prepare_payment_vals(partner, payment['amount'], wizard_lines,
+                                                                 conversion_rates=conversion_rates, **kwargs)
+            payment['reconciliations'] = []
+            for line in wizard_lines:
+                counterpart_amount = sum(
+                    vals['amount_currency'] for dummy, dummy, vals in payment['payment_vals']['line_ids']
+                    if vals['temp_id'] == line.id and vals['account_id'] in line.line_ids.account_id.ids)
+                for invoice, amount in self._split_allocation_amount(line, abs(counterpart_amount)):
+                    payment['reconciliations'].append({
+                        'wizard_line_id': line.id,
+                        'invoice_id': invoice.id,
+                        'invoice_line_ids': line.line_ids._origin.filtered(lambda l: l.move_id == invoice).ids,
+                        'currency_id': line.currency_id.id,
+                        'amount': amount,
+                    })
+        return plan
+
+    def _create_payment_data(self, shard=None, shard_count=1, **kwargs):
+        """ Create the payments of the wizard, or only those of a shard, see _get_payment_groups. """
+        return self._create_payments(self._get_payment_groups(shard=shard, shard_count=shard_count), **kwargs)
+
+    def _prepare_payment_job_vals(self, **kwargs):
+        return {'name': '%s - %s' % (self.journal_id.name, fields.Date.to_string(self.payment_date)),
+                'company_id': self.company_id.id,
+                'journal_id': self.journal_id.id,
+                'currency_id': self.currency_id.id,
+                'payment_date': self.payment_date,
+                'memo': self.memo,
+                'group_payment': self.group_payment,
+                'defer_edi': self.defer_edi,
+                'l10n_mx_edi_payment_method_id': self.l10n_mx_edi_payment_method_id.id,
+                'l10n_mx_edi_usage': self.l10n_mx_edi_usage,
+                'create_values': kwargs,
+                'shard_count': max(self.shard_count, 1),
+                'chunk_ids': [(0, 0, {'sequence': sequence,
+                                      'shard': self._get_partner_shard(partner, self.shard_count),
+                                      'partner_id': partner.id,
+                                      'amount': amount_payment,
+                                      'wizard_values': wizard_lines._prepare_multi_payment_job_values()})
+                              for sequence, (partner, amount_payment, wizard_lines) in
+                              enumerate(self._get_payment_groups())], }
+
+    def _create_payment_job(self, **kwargs):
+        """ Persist the wizard as a multi.payment.job processed one partner payment at a time by a scheduled action.
+        The kwargs returned by _pre_create_action are stored on the job and must be JSON serializable.
+        """
+        job = self.env['multi.payment.job'].create(self._prepare_payment_job_vals(**kwargs))
+        job._trigger_process_crons()
+        return job
+
+    def _prepare_payment_vals(self, partner, amount_payment, wizard_lines, conversion_rates=None, **kwargs):
         extra_move_vals = self._extra_payment_move_vals(partner, amount_payment, **kwargs)
         move_vals = {'l10n_mx_edi_usage': self.l10n_mx_edi_usage,
                      'partner_id': partner.id,
@@ -157,24 +399,158 @@ class MultiPaymentsGeneral(models.TransientModel):
                      'l10n_mx_edi_payment_method_id': self.l10n_mx_edi_payment_method_id.id,
                      'move_type': 'entry',
                      'line_ids': [(0, 0, line_vals) for line_vals in
-                                  wizard_lines._prepare_payment_move_line_default_vals()], }
+                                  wizard_lines._prepare_payment_move_line_default_vals(conversion_rates)], }
         move_vals.update(extra_move_vals)
-        move = self.env['account.payment'].create(move_vals)
-        move.action_post()
-        # Reconcile the account.move.line of the payment with the account.move.line of the invoice.
-        payment_lines = move.line_ids
-        lines = wizard_lines
-        for account in payment_lines.account_id:
-            for line in lines:
-                invoice_lines = line.line_ids
-                payment_line = payment_lines.filtered(lambda x: x.temp_id == line.id)
-                (payment_line + invoice_lines).filtered_domain(
-                    [('account_id', '=', account.id), ('reconciled', '=', False)]).with_context(
-                    no_exchange_difference=True).reconcile()
-        move.move_id._update_payments_edi_documents()
-        move.move_id.edi_document_ids.filtered(
-            lambda x: x.edi_format_id != self.env.ref('l10n_mx_edi.edi_cfdi_3_3')).write({'state': False})
-        return move
+        return move_vals
+
+    def _create_payments(self, payment_groups, **kwargs):
+        """ Create, post and reconcile several payments at once.
+        This is the extension point of payment creation: both the synchronous run (_create_payment_data) and the
+        chunks of background jobs (multi.payment.job) go through it. Per partner values are better customized in
+        _extra_payment_move_vals.
+        :param payment_groups: A list of (partner, amount_payment, wizard_lines) tuples, see _get_payment_groups.
+        :return: The created account.payment records, in the order of payment_groups.
+        """
+        with self._track_phase('create_payment.lock'):
+            self._lock_payment_lines(
+                self.env['account.payment.register'].concat(*[group[2] for group in payment_groups]))
+        conversion_rates = {}
+        vals_list = []
+        for partner, amount_payment, wizard_lines in payment_groups:
+            with self._track_phase('create_payment.prepare', partner_id=partner.id) as phase:
+                vals_list.append(self._prepare_payment_vals(partner, amount_payment, wizard_lines,
+                                                            conversion_rates=conversion_rates, **kwargs))
+                phase['records'] = len(vals_list[-1]['line_ids'])
+        if not vals_list:
+            return self.env['account.payment']
+        with self._track_phase('create_payment.create') as phase:
+            payments = self.env['account.payment'].create(vals_list)
+            phase['records'] = len(payments)
+        with self._track_phase('create_payment.post'):
+            payments.action_post()
+        # Reconcile the account.move.line of the payments with the account.move.line of the invoices.
+        with self._track_phase('create_payment.reconcile'):
+            wizard_lines = self.env['account.payment.register'].concat(*[group[2] for group in payment_groups])
+            allocation_vals = self._prepare_allocation_vals(payments, wizard_lines)
+            self._reconcile_payment_lines(payments, wizard_lines)
+        with self._track_phase('create_payment.allocation') as phase:
+            # The ledger is only written by the module, users are not granted create rights on it.
+            phase['records'] = len(self.env['multi.payment.allocation'].sudo().create(allocation_vals))
+        with self._track_phase('create_payment.edi'):
+            self._post_process_payments_edi(payments)
+        return payments
+
+    def _lock_payment_lines(self, wizard_lines):
+        """ Lock the invoice lines to pay so two overlapping runs can not reconcile them twice. Lines locked by another
+        transaction are reported instead of waiting for them, and lines paid in the meantime are refused.
+        """
+        lines = wizard_lines.line_ids._origin
+        if not lines:
+            return
+        locked_ids = self._try_lock_lines(lines)
+        busy_lines = lines.filtered(lambda l: l.id not in locked_ids)
+        if busy_lines:
+            raise UserError(_("The following invoices are being paid in another operation, please try again later:"
+                              "\n%s", '\n'.join(busy_lines.move_id.mapped('display_name'))))
+        lines.invalidate_recordset(['amount_residual', 'amount_residual_currency', 'reconciled'])
+        paid_lines = lines.filtered('reconciled')
+        if paid_lines:
+            raise UserError(_("The following invoices have already been paid:\n%s",
+                              '\n'.join(paid_lines.move_id.mapped('display_name'))))
+
+    @api.model
+    def _try_lock_lines(self, lines):
+        """ Lock the rows of the given account.move.line records, skipping those locked by another transaction.
+        :return: The set of the locked ids.
+        """
+        self.env.cr.execute("SELECT id FROM account_move_line WHERE id IN %s FOR UPDATE SKIP LOCKED",
+                            [tuple(lines.ids)])
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    def _post_process_payments_edi(self, payments):
+        """ Prepare the CFDI documents of all the payments of the run at once, or flag them so the scheduled action
+        prepares them later on when defer_edi is set.
+        """
+        moves = payments.move_id
+        if self.defer_edi:
+            moves.write({'multipayment_edi_pending': True})
+            self.env.ref('account_multipayment_general.ir_cron_update_multipayment_edi_documents')._trigger()
+        else:
+            moves._update_multipayment_edi_documents()
+
+    def create_payment(self, partner, amount_payment, wizard_lines, **kwargs):
+        """ Shortcut creating a single payment through _create_payments; override _create_payments instead, this
+        method is not called by the module itself.
+        """
+        return self._create_payments([(partner, amount_payment, wizard_lines)], **kwargs)
+
+    @api.model
+    def _split_allocation_amount(self, wizard_line, amount):
+        """ Split the amount paid by a wizard line between its invoices, following their residual before the
+        reconciliation; the last invoice receives what is left.
+        :return: A list of (invoice, amount) tuples.
+        """
+        res = []
+        invoices = wizard_line.line_ids._origin.move_id
+        for invoice in invoices:
+            if invoice == invoices[-1]:
+                invoice_amount = amount
+            else:
+                invoice_lines = wizard_line.line_ids._origin.filtered(lambda l: l.move_id == invoice)
+                invoice_amount = min(amount, abs(sum(invoice_lines.mapped('amount_residual_currency'))))
+            amount -= invoice_amount
+            res.append((invoice, invoice_amount))
+        return res
+
+    def _prepare_allocation_vals(self, payments, wizard_lines):
+        """ Split the counterpart line of each wizard line between its invoices, see _split_allocation_amount.
+        :return: A list of python dictionary to be passed to the multi.payment.allocation's 'create' method.
+        """
+        counterpart_lines = {}
+        for line in payments.line_ids:
+            if line.temp_id and line.account_id.account_type in ('asset_receivable', 'liability_payable'):
+                counterpart_lines[line.temp_id] = line
+
+        vals_list = []
+        for wizard_line in wizard_lines:
+            counterpart_line = counterpart_lines.get(wizard_line.id)
+            if not counterpart_line:
+                continue
+            for invoice, amount in self._split_allocation_amount(wizard_line, abs(counterpart_line.amount_currency)):
+                vals_list.append({'payment_id': counterpart_line.payment_id.id,
+                                  'payment_line_id': counterpart_line.id,
+                                  'invoice_id': invoice.id,
+                                  'partner_id': counterpart_line.partner_id.id,
+                                  'company_id': counterpart_line.company_id.id,
+                                  'currency_id': counterpart_line.currency_id.id,
+                                  'amount': amount, })
+        return vals_list
+
+    def _reconcile_payment_lines(self, payments, wizard_lines):
+        """ Reconcile the journal items of the payments with the invoice lines of their wizard line.
+        Payment lines are indexed once by temp_id and grouped by account in a single pass; each wizard line is then
+        reconciled on its own so an invoice is only matched against the counterpart created for it.
+        """
+        move_line_model = self.env['account.move.line']
+        payment_lines_by_wizard = {}
+        for line in payments.line_ids:
+            if line.temp_id:
+                payment_lines_by_wizard.setdefault(line.temp_id, []).append(line.id)
+
+        pairs = []
+        for wizard_line in wizard_lines:
+            payment_lines = move_line_model.browse(payment_lines_by_wizard.get(wizard_line.id, []))
+            if not payment_lines:
+                continue
+            lines_by_account = {}
+            for line in payment_lines + wizard_line.line_ids:
+                if not line.reconciled:
+                    lines_by_account.setdefault(line.account_id, move_line_model)
+                    lines_by_account[line.account_id] |= line
+            pairs += [lines for lines in lines_by_account.values() if len(lines) > 1]
+
+        for lines in pairs:
+            lines.with_context(no_exchange_difference=True).reconcile()
 
     def _extra_payment_move_vals(self, partner, amount_payment, **kwargs):
         return {}
@@ -0,0 +1,156 @@
+# Copyright 2026 Munin
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import csv
+import io
+import itertools
+import re
+
+from odoo import _, fields, models
+from odoo.exceptions import UserError
+
+IMPORT_CHUNK_SIZE = 1000
+
+
+class MultiPaymentsImport(models.TransientModel):
+    _name = "multi.payments.import"
+    _description = "Importar Multi Pagos"
+
+    data_file = fields.Binary(string="Archivo CSV", required=True, attachment=True,
+                              help="Columnas: referencia de la factura, RFC del cliente, monto, fecha (AAAA-MM-DD).")
+    filename = fields.Char(string="Nombre del Archivo")
+    delimiter = fields.Char(string="Separador", default=',', required=True, size=1)
+    decimal_separator = fields.Selection([('.', 'Punto (1,234.56)'), (',', 'Coma (1.234,56)')],
+                                         string="Separador Decimal", default='.', required=True)
+    has_header = fields.Boolean(string="Con Encabezado", default=True)
+    journal_id = fields.Many2one('account.journal', string="Diario", domain="[('type', '=', 'bank')]",
+                                 default=lambda self: self.env['account.journal']._get_multipayment_default_journal())
+
+    def _open_data_file(self):
+        """ Open the uploaded file as a binary stream, straight from the filestore when possible so the file is never
+        loaded in memory as a whole.
+        """
+        attachment = self.env['ir.attachment'].sudo().search([('res_model', '=', self._name),
+                                                              ('res_field', '=', 'data_file'),
+                                                              ('res_id', '=', self.id)], limit=1)
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return io.BytesIO(attachment.raw or b'')
+
+    def _parse_amount(self, value):
+        """ Parse an amount written with the chosen decimal separator, the other one being only allowed as a thousands
+        separator. Anything else, e.g. '1,5' with a decimal point, is refused instead of being guessed.
+        :raise ValueError: if the amount does not follow the format.
+        """
+        decimal = re.escape(self.decimal_separator)
+        thousands = re.escape(',' if self.decimal_separator == '.' else '.')
+        if not re.fullmatch(r'-?(\d{1,3}(%s\d{3})+|\d+)(%s\d+)?' % (thousands, decimal), value):
+            raise ValueError(value)
+        return float(value.replace(',' if self.decimal_separator == '.' else '.', '').replace(
+            self.decimal_separator, '.'))
+
+    def _read_rows(self, stream):
+        """ Yield (row number, reference, vat, amount, date, error) for each row of the file. """
+        reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''), delimiter=self.delimiter)
+        if self.has_header:
+            next(reader, None)
+        for row_number, row in enumerate(reader, start=2 if self.has_header else 1):
+            if not any(row):
+                continue
+            if len(row) < 4:
+                yield row_number, None, None, None, None, _("Expected 4 columns, got %s.", len(row))
+                continue
+            reference, vat, amount, date = (value.strip() for value in row[:4])
+            try:
+                amount = self._parse_amount(amount)
+                date = fields.Date.to_date(date)
+                if not date:
+                    raise ValueError(date)
+            except ValueError:
+                yield row_number, reference, vat, None, None, _("Invalid amount or date.")
+                continue
+            yield row_number, reference, vat, amount, date, None
+
+    def _prepare_register_vals(self, rows, errors):
+        """ Resolve the invoice references of a chunk of rows with a single search.
+        :param rows:   A list of rows as yielded by _read_rows, without error.
+        :param errors: The list collecting (row number, reference, message) of the rows that do not match.
+        :return: A list of python dictionary to be passed to the account.payment.register's 'create' method.
+        """
+        moves = self.env['account.move'].search([('name', 'in', [row[1] for row in rows]),
+                                                 ('state', '=', 'posted'),
+                                                 ('company_id', '=', self.journal_id.company_id.id)])
+        moves_by_name = {}
+        for move in moves:
+            moves_by_name.setdefault(move.name, self.env['account.move'])
+            moves_by_name[move.name] |= move
+        lines_by_move = moves._get_multipayment_open_lines()
+
+        vals_list = []
+        for row_number, reference, vat, amount, date, dummy in rows:
+            move = moves_by_name.get(reference)
+            if not move:
+                errors.append((row_number, reference, _("Invoice not found.")))
+            elif len(move) > 1:
+                errors.append((row_number, reference, _("Several invoices match this reference.")))
+            elif vat and (move.commercial_partner_id.vat or '').upper() != vat.upper():
+                errors.append((row_number, reference, _("The VAT does not match the invoice partner.")))
+            elif move not in lines_by_move:
+                errors.append((row_number, reference, _("There is nothing left to pay on this invoice.")))
+            elif len(set(lines_by_move[move].mapped('account_type'))) > 1:
+                errors.append((row_number, reference, _("The invoice has both receivable and payable items.")))
+            else:
+                lines = lines_by_move.pop(move)
+                vals_list.append({'partner_id': lines[0].partner_id.id,
+                                  'line_ids': [(6, 0, lines.ids)],
+                                  'journal_id': self.journal_id.id,
+                                  'payment_date': date,
+                                  'amount': amount, })
+        return vals_list
+
+    def action_import(self):
+        self.ensure_one()
+        multi_payment = self.env['multi.payments.general'].create({'journal_id': self.journal_id.id,
+                                                                   'company_id': self.journal_id.company_id.id})
+        errors = []
+        seen_references = set()
+        payment_date = False
+        with self._open_data_file() as stream:
+            rows = self._read_rows(stream)
+            while True:
+                chunk = []
+                for row in itertools.islice(rows, IMPORT_CHUNK_SIZE):
+                    row_number, reference, dummy, dummy, date, error = row
+                    if error:
+                        errors.append((row_number, reference, error))
+                    elif reference in seen_references:
+                        errors.append((row_number, reference, _("Duplicated invoice reference.")))
+                    else:
+                        seen_references.add(reference)
+                        chunk.append(row)
+                        payment_date = payment_date or date
+                if not chunk:
+                    break
+                vals_list = self._prepare_register_vals(chunk, errors)
+                register_payments = self.env['account.payment.register'].create(
+                    [dict(vals, multi_payment_general_id=multi_payment.id) for vals in vals_list])
+                register_payments._compute_communication()
+                self.env.flush_all()
+                self.env.invalidate_all()
+
+        if not multi_payment.register_payment_line:
+            raise UserError(_("No row of the file matches an invoice to pay.\n%s",
+                              self._format_import_errors(errors[:50])))
+        multi_payment.write({'payment_date': payment_date,
+                             'import_error_report': self._format_import_errors(errors)})
+        return {
+            'name': _('Register Payment Multi Invoice'),
+            'res_model': 'multi.payments.general',
+            'view_mode': 'form',
+            'target': 'new',
+            'res_id': multi_payment.id,
+            'type': 'ir.actions.act_window', }
+
+    def _format_import_errors(self, errors):
+        return '\n'.join(_("Line %s (%s): %s", row_number, reference or '', message)
+                         for row_number, reference, message in sorted(errors, key=lambda error: error[0]))